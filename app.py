@@ -1,23 +1,87 @@
 #  D:/bynry/.venv/Scripts/python.exe app.py
 from flask import Flask
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, Response, stream_with_context, g, has_request_context
+from flask.json.provider import JSONProvider
+from flask_caching import Cache
 from flask_sqlalchemy import SQLAlchemy
 from decimal import Decimal, InvalidOperation
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from sqlalchemy import func, select, bindparam, event, text
+from sqlalchemy.engine import Engine
+from datetime import datetime
 import math
 import os
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 load_dotenv()
 
 app = Flask(__name__)
 
-app.config['SQLALCHEMY_DATABASE_URI'] = f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
+# mysqlclient (C driver) decodes result rows in native code, roughly
+# halving per-row CPU vs pure-Python PyMySQL on large result sets
+app.config['SQLALCHEMY_DATABASE_URI'] = f"mysql+mysqldb://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}?charset=utf8mb4"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Larger pool so concurrent requests don't block on connection checkout;
+# recycle well under MySQL's wait_timeout instead of pinging per checkout
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': 20,
+    'max_overflow': 40,
+    'pool_recycle': 1800,
+    'pool_pre_ping': False,
+}
+# Short-TTL Redis cache for the alerts dashboard; stale by at most 30s
+# and invalidated explicitly on inventory writes
+app.config['CACHE_TYPE'] = 'RedisCache'
+app.config['CACHE_REDIS_URL'] = os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/0')
+app.config['CACHE_DEFAULT_TIMEOUT'] = 30
+
+# orjson serializes large payloads several times faster than stdlib
+# json and emits compact output; fall back to stdlib when unavailable
+class ORJSONProvider(JSONProvider):
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+if orjson is not None:
+    app.json = ORJSONProvider(app)
+else:
+    app.json.compact = True
+
+# Serializer used by the streaming alerts generator
+dumps = app.json.dumps
 
 db = SQLAlchemy(app)
+cache = Cache(app)
+
+# Per-request query counting so N+1 bursts are visible instead of
+# silent; anything over the budget gets logged in debug mode
+QUERY_BUDGET = 5
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_queries(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = getattr(g, 'query_count', 0) + 1
+
+@app.after_request
+def _warn_on_query_budget(response):
+    count = getattr(g, 'query_count', 0)
+    if current_app.debug:
+        # Exposed so tooling (or a future test suite) can assert a
+        # per-endpoint query budget against the response
+        response.headers['X-Query-Count'] = str(count)
+        if count > QUERY_BUDGET:
+            current_app.logger.warning(
+                "query budget exceeded: %d queries for %s %s",
+                count, request.method, request.path
+            )
+    return response
 
 # Models
 class Company(db.Model):
@@ -36,6 +100,9 @@ class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     sku = db.Column(db.String(100), nullable=False, unique=True)
+    # Generated column enforcing case/whitespace-insensitive SKU
+    # uniqueness at the DB level, replacing normalization in app code
+    sku_norm = db.Column(db.String(100), db.Computed('UPPER(TRIM(sku))', persisted=True), unique=True)
     price = db.Column(db.Numeric(10, 2), nullable=False)
     reorder_threshold = db.Column(db.Integer, nullable=False, default=10)
 
@@ -51,6 +118,15 @@ class ProductSupplier(db.Model):
     supplier_id = db.Column(db.Integer, db.ForeignKey('supplier.id'), primary_key=True)
     is_primary = db.Column(db.Boolean, default=False)
 
+# View over product_supplier rows with is_primary = 1 (see
+# migrations/005_product_primary_supplier_view.sql); gives the planner a
+# pre-filtered relation for the primary-supplier lookup
+product_primary_supplier = db.Table(
+    'product_primary_supplier',
+    db.Column('product_id', db.Integer, primary_key=True),
+    db.Column('supplier_id', db.Integer),
+)
+
 class Inventory(db.Model):
     __tablename__ = 'inventory'
     id = db.Column(db.Integer, primary_key=True)
@@ -58,6 +134,16 @@ class Inventory(db.Model):
     warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouse.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False, default=0)
 
+    product = db.relationship('Product')
+
+    # warehouse -> product join direction for the low-stock query; the
+    # product -> warehouse direction is covered by the UNIQUE
+    # (product_id, warehouse_id) key, and warehouse(company_id) is
+    # already indexed in the baseline schema
+    __table_args__ = (
+        db.Index('ix_inventory_wh_prod', 'warehouse_id', 'product_id'),
+    )
+
 class InventoryHistory(db.Model):
     __tablename__ = 'inventory_history'
     id = db.Column(db.Integer, primary_key=True)
@@ -66,6 +152,81 @@ class InventoryHistory(db.Model):
     reason = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    inventory = db.relationship('Inventory')
+
+    # Covering index so the 30-day usage aggregation (and the rollup
+    # backfill) is an index-only scan instead of clustered-row lookups
+    __table_args__ = (
+        db.Index('ix_invhist_inv_created_change', 'inventory_id', 'created_at', 'change_amount'),
+    )
+
+class DailyInventoryUsage(db.Model):
+    # Per-day rollup of negative inventory_history changes, kept current
+    # by an AFTER INSERT trigger (see migrations/001_daily_inventory_usage.sql)
+    __tablename__ = 'daily_inventory_usage'
+    inventory_id = db.Column(db.Integer, db.ForeignKey('inventory.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    usage = db.Column(db.Integer, nullable=False, default=0)
+
+# Statements for the hot alerts endpoint are built once at import time
+# with bindparams, so requests only bind values instead of rebuilding
+# and recompiling the query AST
+
+_USAGE_CTE = (
+    select(
+        DailyInventoryUsage.inventory_id.label('iid'),
+        func.sum(DailyInventoryUsage.usage).label('total_usage')
+    )
+    # Window start computed in MySQL: no datetime bind to serialize and
+    # the statement stays byte-identical across requests for plan reuse
+    .where(DailyInventoryUsage.day >= func.date_sub(func.utc_date(), text('INTERVAL 30 DAY')))
+    .group_by(DailyInventoryUsage.inventory_id)
+    .cte('recent_usage')
+)
+
+# Plain columns, not ORM entities: the endpoint is read-only, so rows
+# skip identity-map and instrumentation overhead entirely
+LOW_STOCK_STMT = (
+    select(
+        Product.id.label('product_id'),
+        Product.name.label('product_name'),
+        Product.sku,
+        Product.reorder_threshold,
+        Inventory.quantity,
+        Warehouse.id.label('warehouse_id'),
+        Warehouse.name.label('warehouse_name'),
+        _USAGE_CTE.c.total_usage,
+        Inventory.id.label('inventory_id')
+    )
+    # Drive the join from the company-filtered warehouse rows (the small
+    # side) outward; STRAIGHT_JOIN pins that order regardless of stats
+    .select_from(Warehouse)
+    .join(Inventory, Inventory.warehouse_id == Warehouse.id)
+    .join(Product, Inventory.product_id == Product.id)
+    .join(_USAGE_CTE, Inventory.id == _USAGE_CTE.c.iid)
+    .prefix_with('STRAIGHT_JOIN')
+    .where(
+        Warehouse.company_id == bindparam('cid'),
+        Inventory.quantity < Product.reorder_threshold,
+        Inventory.id > bindparam('cursor')
+    )
+    .order_by(Inventory.id)
+    .limit(bindparam('page_limit'))
+)
+
+PRIMARY_SUPPLIER_STMT = (
+    select(
+        product_primary_supplier.c.product_id,
+        Supplier.id,
+        Supplier.name,
+        Supplier.contact_email
+    )
+    .join(Supplier, product_primary_supplier.c.supplier_id == Supplier.id)
+    .where(
+        product_primary_supplier.c.product_id.in_(bindparam('pids', expanding=True))
+    )
+)
+
 # create new product endpoint
 @app.route('/api/products', methods=['POST'])
 def create_product():
@@ -95,50 +256,58 @@ def create_product():
     except (ValueError, TypeError):
         return jsonify({'error': 'initial_quantity must be a non-negative integer'}), 400
 
-# Normalize SKU to avoid case-sensitive duplicates
-    normalized_sku = sku.strip().upper()
-    existing_product = Product.query.filter_by(sku=normalized_sku).first()
-    if existing_product:
-        return jsonify({"error": "SKU already exists"}), 409
-
-    # simple 'warehouse exist' check
+    # Cheap type check (no DB round-trip); a malformed value would
+    # otherwise surface as a MySQL data error at flush and return 500.
+    # Existence is still left to the FK constraint
     if warehouse_id is not None:
-        if not Warehouse.query.get(warehouse_id):
-            return jsonify({'error': 'warehouse_id does not exist'}), 400
-
+        try:
+            warehouse_id = int(warehouse_id)
+        except (ValueError, TypeError):
+            return jsonify({'error': 'warehouse_id must be an integer'}), 400
+
+# No Python-side SKU normalization or pre-check SELECTs: the sku_norm
+# generated column's UNIQUE constraint enforces case/whitespace-
+# insensitive uniqueness, and races surface as IntegrityError
     try:
         with db.session.begin():
             product = Product(
                 name=name.strip(),
-                sku=normalized_sku, 
+                sku=sku,
                 price=price
             )
             db.session.add(product)
-            db.session.flush() 
 
             if warehouse_id is not None:
+                # Relationships let SQLAlchemy wire the FKs itself, so
+                # all three inserts go out in one flush ordered by
+                # dependency instead of a flush per insert
                 inventory = Inventory(
-                    product_id=product.id,
+                    product=product,
                     warehouse_id=warehouse_id,
                     quantity=qty
                 )
                 db.session.add(inventory)
-                db.session.flush() 
 
                 # Add inventory history record for initial stock
                 if qty > 0:
                     history = InventoryHistory(
-                        inventory_id=inventory.id,
+                        inventory=inventory,
                         change_amount=qty,
                         reason="Initial stock"
                     )
                     db.session.add(history)
 
-        return jsonify({"message": "Product created", "product_id": product.id}), 201
+            # Single flush so product.id is available for the response
+            db.session.flush()
+            product_id = product.id
 
     except IntegrityError as ie:
         db.session.rollback()
         current_app.logger.exception("IntegrityError creating product")
+        # MySQL 1452 = foreign key failure (bad warehouse_id),
+        # 1062 = duplicate key (SKU)
+        if ie.orig is not None and ie.orig.args and ie.orig.args[0] == 1452:
+            return jsonify({'error': 'warehouse_id does not exist'}), 400
         return jsonify({"error": "SKU already exists or integrity constraint violated"}), 409
 
     except Exception:
@@ -146,73 +315,104 @@ def create_product():
         current_app.logger.exception("Unexpected error creating product")
         return jsonify({"error": "Internal server error"}), 500
 
+    # Inventory changed: drop the company's cached alerts page. The
+    # write is already committed, so a cache (or lookup) failure here
+    # must never turn the response into an error
+    if warehouse_id is not None:
+        try:
+            owner_company_id = db.session.query(Warehouse.company_id).filter(
+                Warehouse.id == warehouse_id
+            ).scalar()
+            if owner_company_id is not None:
+                cache.delete(f'lowstock:{owner_company_id}')
+        except Exception:
+            current_app.logger.exception("Failed to invalidate alerts cache")
+
+    return jsonify({"message": "Product created", "product_id": product_id}), 201
+
 # company low stock alerts endpoint
 @app.route('/api/companies/<int:company_id>/alerts/low-stock', methods=['GET'])
 def get_low_stock_alerts(company_id):
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-
-    recent_sales_subquery = db.session.query(
-        InventoryHistory.inventory_id
-    ).filter(
-        InventoryHistory.created_at >= thirty_days_ago,
-        InventoryHistory.change_amount < 0
-    ).distinct().subquery()
-
-    low_stock_items = db.session.query(
-        Product,
-        Inventory.quantity,
-        Warehouse,
-        Supplier,
-        Inventory.id.label('inventory_id')
-    ).join(
-        Product, Inventory.product_id == Product.id
-    ).join(
-        Warehouse, Inventory.warehouse_id == Warehouse.id
-    ).join(
-        recent_sales_subquery, Inventory.id == recent_sales_subquery.c.inventory_id
-    ).outerjoin(
-        ProductSupplier, (Product.id == ProductSupplier.product_id) & (ProductSupplier.is_primary == True)
-    ).outerjoin(
-        Supplier, ProductSupplier.supplier_id == Supplier.id
-    ).filter(
-        Warehouse.company_id == company_id,
-        Inventory.quantity < Product.reorder_threshold  
-    ).all()
-
-    alerts = []
-    for product, current_stock, warehouse, supplier, inventory_id in low_stock_items:
-        usage_data = db.session.query(
-            func.sum(InventoryHistory.change_amount * -1).label('total_usage') 
-        ).filter(
-            InventoryHistory.inventory_id == inventory_id,
-            InventoryHistory.created_at >= thirty_days_ago,
-            InventoryHistory.change_amount < 0 
-        ).first()
-        
-        # Calculate days until stockout
-        days_until_stockout = None
-        if usage_data and usage_data.total_usage:
-            avg_daily_usage = usage_data.total_usage / Decimal(30)  
-            if avg_daily_usage > 0:
-               days_until_stockout = int(current_stock / avg_daily_usage)
-        
-        supplier_info = None
-        if supplier:
-            supplier_info = { "id": supplier.id, "name": supplier.name, "contact_email": supplier.contact_email }
-        
-        alerts.append({
-            "product_id": product.id, 
-            "product_name": product.name, 
-            "sku": product.sku,
-            "warehouse_id": warehouse.id, 
-            "warehouse_name": warehouse.name,
-            "current_stock": current_stock, 
-            "threshold": product.reorder_threshold,  
-            "days_until_stockout": days_until_stockout, 
-            "supplier": supplier_info
-        })
-
-    return jsonify({"alerts": alerts, "total_alerts": len(alerts)})
+    # Keyset pagination bounds per-request memory regardless of tenant size
+    try:
+        cursor = int(request.args.get('cursor', 0))
+        limit = int(request.args.get('limit', 100))
+        if cursor < 0 or not (0 < limit <= 500):
+            raise ValueError
+    except (ValueError, TypeError):
+        return jsonify({'error': 'cursor must be >= 0 and limit between 1 and 500'}), 400
+
+    # The dashboard hot path (first page, default size) is cached whole;
+    # deeper pages vary by cursor and are always served fresh
+    is_default_page = cursor == 0 and limit == 100
+    cache_key = f'lowstock:{company_id}'
+    if is_default_page:
+        # A Redis outage degrades to the uncached path, never a 500
+        try:
+            cached = cache.get(cache_key)
+        except Exception:
+            current_app.logger.exception("Alerts cache read failed; serving uncached")
+            cached = None
+        if cached is not None:
+            return Response(cached, mimetype='application/json')
+
+    # yield_per streams the page off the server-side cursor instead of
+    # materializing the result set in the driver first
+    low_stock_items = list(db.session.execute(
+        LOW_STOCK_STMT,
+        {'cid': company_id, 'cursor': cursor, 'page_limit': limit},
+        execution_options={'yield_per': 500}
+    ))
+
+    # Batch-fetch primary suppliers for the affected products in one
+    # IN-query and merge in Python (selectinload-style eager load)
+    suppliers_by_product = {}
+    product_ids = {row.product_id for row in low_stock_items}
+    if product_ids:
+        supplier_rows = db.session.execute(
+            PRIMARY_SUPPLIER_STMT, {'pids': list(product_ids)}
+        ).all()
+        for pid, sid, sname, semail in supplier_rows:
+            suppliers_by_product[pid] = {"id": sid, "name": sname, "contact_email": semail}
+
+    # next_cursor lets the client fetch the following page; null when
+    # this page was not full
+    next_cursor = low_stock_items[-1].inventory_id if len(low_stock_items) == limit else None
+
+    def generate():
+        yield '{"alerts": ['
+        for i, row in enumerate(low_stock_items):
+            # Days until stockout with int math only; SUM comes back as
+            # Decimal from the driver, so convert once per row
+            usage = int(row.total_usage) if row.total_usage else 0
+            days_until_stockout = (row.quantity * 30) // usage if usage else None
+
+            alert = {
+                "product_id": row.product_id,
+                "product_name": row.product_name,
+                "sku": row.sku,
+                "warehouse_id": row.warehouse_id,
+                "warehouse_name": row.warehouse_name,
+                "current_stock": row.quantity,
+                "threshold": row.reorder_threshold,
+                "days_until_stockout": days_until_stockout,
+                "supplier": suppliers_by_product.get(row.product_id)
+            }
+            yield (', ' if i else '') + dumps(alert)
+        yield '], "total_alerts": %d, "next_cursor": %s}' % (
+            len(low_stock_items), dumps(next_cursor))
+
+    if is_default_page:
+        # Materialize (page size already bounds memory) so the body can
+        # be cached for the next 30s of dashboard hits
+        body = ''.join(generate())
+        try:
+            cache.set(cache_key, body)
+        except Exception:
+            current_app.logger.exception("Alerts cache write failed")
+        return Response(body, mimetype='application/json')
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,32 @@
+-- Rollup table for the low-stock alerts endpoint: one row per
+-- (inventory, day) holding the units sold that day, so the 30-day usage
+-- is a small SUM over the rollup instead of a scan of inventory_history.
+
+CREATE TABLE `daily_inventory_usage` (
+  `inventory_id` INT NOT NULL,
+  `day` DATE NOT NULL,
+  `usage` INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (`inventory_id`, `day`),
+  CONSTRAINT `fk_daily_usage_inventory` FOREIGN KEY (`inventory_id`) REFERENCES `inventory` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Backfill from existing history (sales are negative change_amount)
+INSERT INTO `daily_inventory_usage` (`inventory_id`, `day`, `usage`)
+SELECT `inventory_id`, DATE(`created_at`), SUM(-`change_amount`)
+FROM `inventory_history`
+WHERE `change_amount` < 0
+GROUP BY `inventory_id`, DATE(`created_at`);
+
+-- Keep the rollup current incrementally on every history insert
+DELIMITER $$
+CREATE TRIGGER `trg_inventory_history_daily_usage`
+AFTER INSERT ON `inventory_history`
+FOR EACH ROW
+BEGIN
+  IF NEW.`change_amount` < 0 THEN
+    INSERT INTO `daily_inventory_usage` (`inventory_id`, `day`, `usage`)
+    VALUES (NEW.`inventory_id`, DATE(NEW.`created_at`), -NEW.`change_amount`)
+    ON DUPLICATE KEY UPDATE `usage` = `usage` + (-NEW.`change_amount`);
+  END IF;
+END$$
+DELIMITER ;
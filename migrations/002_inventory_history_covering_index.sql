@@ -0,0 +1,11 @@
+-- Covering index for the 30-day usage aggregation:
+--   WHERE inventory_id = ? AND created_at >= ? AND change_amount < 0
+-- With all three columns in the index MySQL can satisfy the SUM from
+-- the secondary index alone (index-only scan), skipping row lookups.
+
+CREATE INDEX `ix_invhist_inv_created_change`
+  ON `inventory_history` (`inventory_id`, `created_at`, `change_amount`);
+
+-- The old single-column FK key is a prefix of the covering index and
+-- would just be a second index to maintain on every history insert
+ALTER TABLE `inventory_history` DROP KEY `inventory_id`;
@@ -0,0 +1,9 @@
+-- Index for the warehouse -> inventory -> product join direction used
+-- by the low-stock query. The other access paths already exist in the
+-- baseline schema: warehouse has KEY company_id, and inventory's
+-- UNIQUE (product_id, warehouse_id) covers product-first lookups.
+
+CREATE INDEX `ix_inventory_wh_prod` ON `inventory` (`warehouse_id`, `product_id`);
+
+-- The old single-column FK key is a prefix of the new index
+ALTER TABLE `inventory` DROP KEY `warehouse_id`;
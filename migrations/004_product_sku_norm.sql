@@ -0,0 +1,7 @@
+-- Case/whitespace-insensitive SKU uniqueness enforced in the database:
+-- a STORED generated column normalizes the SKU once on write, and its
+-- UNIQUE index replaces the normalization previously done in app code.
+
+ALTER TABLE `product`
+  ADD COLUMN `sku_norm` VARCHAR(100) AS (UPPER(TRIM(`sku`))) STORED,
+  ADD UNIQUE INDEX `ux_product_sku_norm` (`sku_norm`);
@@ -0,0 +1,10 @@
+-- Pre-filtered relation for primary-supplier lookups so the hot query
+-- joins a smaller row set instead of re-evaluating is_primary per row.
+-- A plain view suffices on MySQL (merged into the outer query); if it
+-- ever shows up in profiles, swap in a lookup table synced by triggers
+-- on product_supplier.
+
+CREATE VIEW `product_primary_supplier` AS
+SELECT `product_id`, `supplier_id`
+FROM `product_supplier`
+WHERE `is_primary` = 1;